@@ -10,8 +10,7 @@ import pathlib
 import random
 import json
 
-from collections import defaultdict
-from typing import Optional
+from typing import NamedTuple, Optional
 
 # For terraform generation
 import time
@@ -63,6 +62,125 @@ except:
 SUBNET_TYPES = ["public", "internal"]
 
 
+class RegionPlan(NamedTuple):
+    """Planned VPC CIDR blocks and AZ subnets for one region."""
+
+    primary: ipaddress.IPv4Network
+    secondary: list[ipaddress.IPv4Network]
+    unused_secondary: list[ipaddress.IPv4Network]
+    zone_ids: list[str]
+
+    # subnet type => zone id => subnet
+    subnets: dict[str, dict[str, ipaddress.IPv4Network]]
+    unused_subnets: list[ipaddress.IPv4Network]
+
+    def to_dict(self) -> dict:
+        """Render this region in the saved plan JSON layout (all networks as strings)."""
+        subnets = {
+            st: {z: str(s) for z, s in zones.items()}
+            for st, zones in self.subnets.items()
+        }
+        subnets["_unused"] = [str(s) for s in self.unused_subnets]
+
+        return dict(
+            subnets=subnets,
+            vpc=dict(
+                primary=str(self.primary),
+                secondary=[str(s) for s in self.secondary],
+                _unused=[str(s) for s in self.unused_secondary],
+            ),
+            ZoneId=list(self.zone_ids),
+        )
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "RegionPlan":
+        """Restore a region from the saved plan JSON layout."""
+        net = ipaddress.ip_network
+        subnets = dict(config["subnets"])
+        unused_subnets = subnets.pop("_unused", [])
+
+        return cls(
+            primary=net(config["vpc"]["primary"]),
+            secondary=[net(s) for s in config["vpc"]["secondary"]],
+            unused_secondary=[net(s) for s in config["vpc"]["_unused"]],
+            zone_ids=config["ZoneId"],
+            subnets={
+                st: {z: net(s) for z, s in zones.items()}
+                for st, zones in subnets.items()
+            },
+            unused_subnets=[net(s) for s in unused_subnets],
+        )
+
+
+class NetworkPlan:
+    """Complete in-memory network plan for all regions, in provisioning order.
+
+    'build_subnets' returns one of these and every emitter consumes it directly,
+    so persisting the plan to JSON is optional and never required for rendering."""
+
+    __slots__ = ("regions", "source")
+
+    def __init__(
+        self,
+        regions: dict[str, RegionPlan],
+        source: Optional[pathlib.Path] = None,
+    ):
+        self.regions = regions
+
+        # file this plan was last saved to or loaded from (None if never persisted)
+        self.source = source
+
+    def __getitem__(self, region: str) -> RegionPlan:
+        return self.regions[region]
+
+    def __iter__(self):
+        return iter(self.regions)
+
+    def __len__(self):
+        return len(self.regions)
+
+    def items(self):
+        return self.regions.items()
+
+    def to_dict(self) -> dict:
+        return {region: plan.to_dict() for region, plan in self.regions.items()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=4)
+
+    @classmethod
+    def from_json(
+        cls, src: str, source: Optional[pathlib.Path] = None
+    ) -> "NetworkPlan":
+        return cls(
+            {
+                region: RegionPlan.from_dict(config)
+                for region, config in json.loads(src).items()
+            },
+            source,
+        )
+
+    def save(self, path: pathlib.Path) -> None:
+        """Write this plan as JSON to 'path' and remember it as the plan source."""
+        path = pathlib.Path(path)
+        path.write_text(self.to_json())
+        self.source = path
+        logger.info("[{}] Saved network plan", path)
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> "NetworkPlan":
+        """Read a plan previously written by 'save'."""
+        path = pathlib.Path(path)
+        return cls.from_json(path.read_text(), path)
+
+    def __str__(self):
+        # short per-region summary (also what the CLI prints after planning)
+        return "\n".join(
+            f"{region}: {plan.primary} (+{len(plan.secondary)} secondary) across {len(plan.zone_ids)} zones"
+            for region, plan in self.regions.items()
+        )
+
+
 class GlobalVPCBuilder:
     """Generate a non-overlaping subnet configuration for all AZs in all Regions."""
 
@@ -73,9 +191,14 @@ class GlobalVPCBuilder:
         az_subnet_prefix: int = None,
         account_offset: int = None,
         subnet_types: list[str] = ["public", "internal"],
-        regions_cache: str = "cache.myregions.json",
-        regions_result: str = "planned.myregions.json",
+        regions_cache: Optional[str] = "cache.myregions.json",
+        regions_result: Optional[str] = "planned.myregions.json",
+        myregions: Optional[dict[str, dict[str, list[str]]]] = None,
     ):
+        """Use 'regions_cache=None' and 'regions_result=None' to plan without touching disk.
+
+        'myregions' may provide the region to AZ mapping directly instead of
+        discovering it (see '_load_region_az_mapping' for the format)."""
 
         self._establish_config(
             max_regions,
@@ -85,17 +208,24 @@ class GlobalVPCBuilder:
             subnet_types,
         )
 
-        self.regions_cache = pathlib.Path(regions_cache)
-        self.regions_result = pathlib.Path(regions_result)
+        self.regions_cache = pathlib.Path(regions_cache) if regions_cache else None
+        self.regions_result = pathlib.Path(regions_result) if regions_result else None
+
+        # region is:
+        # region-name => {'ZoneName': [zones-by-name], 'ZoneId': [zones-by-id]}
+        self.myregions: dict[str, dict[str, list[str]]] = myregions or dict()
+
+        # most recent plan from build_subnets() (or loaded from regions_result)
+        self.plan: Optional[NetworkPlan] = None
 
     def _load_region_az_mapping(self):
         """Load cached (or generate live) region to AZ mapping your AWS account/profile can see."""
 
-        # region is:
-        # region-name => {'ZoneName': [zones-by-name], 'ZoneId': [zones-by-id]}
-        self.myregions: dict[str, dict[str, list[str]]] = dict()
+        # already loaded (or provided directly by caller)
+        if self.myregions:
+            return
 
-        if self.regions_cache.is_file():
+        if self.regions_cache and self.regions_cache.is_file():
             logger.info("[{}] Loading cached myregions...", self.regions_cache)
             try:
                 self.myregions = json.loads(self.regions_cache.read_text())
@@ -129,8 +259,9 @@ class GlobalVPCBuilder:
                 logger.warning("[{}] Failed to access!", r)
                 pass
 
-        json.dump(self.myregions, self.regions_cache.open("w"), indent=4)
-        logger.info("Cached regions at {}", self.regions_cache)
+        if self.regions_cache:
+            json.dump(self.myregions, self.regions_cache.open("w"), indent=4)
+            logger.info("Cached regions at {}", self.regions_cache)
 
     def _establish_config(
         self,
@@ -213,8 +344,11 @@ class GlobalVPCBuilder:
             self.SUBNET_TYPES,
         )
 
-    def build_subnets(self, shuffle: bool = False):
-        """Build a globally non-overlapping subnet configuration for every region and every AZ."""
+    def build_subnets(self, shuffle: bool = False, save: bool = True) -> NetworkPlan:
+        """Build a globally non-overlapping subnet configuration for every region and every AZ.
+
+        Returns the plan (also kept as self.plan) and, if 'save' and a 'regions_result'
+        path is configured, writes it once as JSON to 'regions_result'."""
         self._load_region_az_mapping()
 
         # 10/8 gives us 2^(32-8) = 2^24 = 16 million IPs to allocate globally.
@@ -302,7 +436,7 @@ class GlobalVPCBuilder:
         # Plan the subnets across all zones inside all regions
         # ================================================================================
         # Then use the regions we *do* have access to for creating in-region subnets in each availability zone we can see.
-        subnets_per_region = defaultdict(dict)
+        regions: dict[str, RegionPlan] = {}
         for region in PROVISION_ORDER:
             # Skip regions we discovered but don't have configured
             if region not in self.myregions:
@@ -328,7 +462,6 @@ class GlobalVPCBuilder:
             )
 
             subnets_per_zone = {}
-            subnets_per_region[region]["subnets"] = subnets_per_zone
             zones_legacy = zone_maps["ZoneName"]
             zones_direct = list(sorted(zone_maps["ZoneId"]))
 
@@ -384,8 +517,6 @@ class GlobalVPCBuilder:
             # ================================================================================
             # Calculate unused subnets for reporting
             # ================================================================================
-            subnets_per_zone["_unused"] = contiguous_zone_subnets
-
             # default keep is 0 because if no secondary vpc subnet blocks match,
             # we don't add any of them since we didn't use their IP space for allocations.
             keep_secondary_upto = 0
@@ -415,36 +546,42 @@ class GlobalVPCBuilder:
                     len(secondary_subnets_in_use),
                 )
 
-            subnets_per_region[region]["vpc"] = dict(
+            regions[region] = RegionPlan(
                 primary=primary_subnet_block,
                 secondary=secondary_subnets_in_use,
-                _unused=unused_secondary_subnets,
+                unused_secondary=unused_secondary_subnets,
+                zone_ids=zones_direct,
+                subnets=subnets_per_zone,
+                unused_subnets=contiguous_zone_subnets,
             )
-            subnets_per_region[region]["ZoneId"] = zones_direct
+
+        self.plan = NetworkPlan(regions)
 
         # Save planned result to file...
-        json.dump(
-            subnets_per_region,
-            self.regions_result.open("w"),
-            default=str,
-            indent=4,
-        )
+        if save and self.regions_result:
+            self.plan.save(self.regions_result)
 
-        logger.info("[{}] Saved network plan", self.regions_result)
+        return self.plan
 
-    def generate_terraform_config(
-        self, profile="default", output="suggested.myregions.tf", include_unused=True
-    ):
-        """Generate a Terraform config for all regions and all subnets pre-planed by 'build_subnets'"""
-        if not self.regions_result.is_file():
-            self.build_subnets()
+    def _current_plan(self) -> NetworkPlan:
+        """Return the in-memory plan, else the saved plan from 'regions_result', else plan now."""
+        if self.plan is None:
+            if self.regions_result and self.regions_result.is_file():
+                self.plan = NetworkPlan.load(self.regions_result)
+                logger.info("[{}] Loaded network plan", self.regions_result)
+            else:
+                self.build_subnets()
+
+        return self.plan
+
+    def render_terraform(self, profile="default", include_unused=True) -> str:
+        """Render a Terraform config for all regions and all subnets pre-planned by 'build_subnets'"""
+        plan = self._current_plan()
 
-        # load plan from file instead of using live result because live
-        # result (subnets_per_region from build_subnets()) has IPv4Network
-        # instances instead of strings for subnet descriptions.
-        src = self.regions_result.read_bytes()
-        subnets_per_region = json.loads(src)
-        base = pathlib.Path("./tf").mkdir(parents=True, exist_ok=True)
+        # hash the serialized plan (identical to the saved JSON) so the
+        # generated config records exactly which plan produced it.
+        src = plan.to_json().encode()
+        name = plan.source or "in-memory plan"
 
         m5 = hashlib.md5(src).hexdigest()
         s256 = hashlib.sha256(src).hexdigest()
@@ -452,19 +589,27 @@ class GlobalVPCBuilder:
         b2 = hashlib.blake2b(src).hexdigest()
 
         layout = [
-            f"# Autogenerated VPC Config using {self.regions_result} at {time.time()} ({datetime.datetime.now()})",
+            f"# Autogenerated VPC Config using {name} at {time.time()} ({datetime.datetime.now()})",
             "\n",
-            f"# {self.regions_result} Last Change Timestamp: {self.regions_result.stat().st_ctime}",
-            "\n",
-            f"# {self.regions_result} md5: {m5}",
+        ]
+
+        if plan.source:
+            layout += [
+                f"# {name} Last Change Timestamp: {plan.source.stat().st_ctime}",
+                "\n",
+            ]
+
+        layout += [
+            f"# {name} md5: {m5}",
             "\n",
-            f"# {self.regions_result} sha256: {s256}",
+            f"# {name} sha256: {s256}",
             "\n",
-            f"# {self.regions_result} sha3-256: {s3_256}",
+            f"# {name} sha3-256: {s3_256}",
             "\n",
-            f"# {self.regions_result} blake2b: {b2}",
+            f"# {name} blake2b: {b2}",
         ]
-        for region, config in subnets_per_region.items():
+        for region, region_plan in plan.items():
+            config = region_plan.to_dict()
             cidr_primary = config["vpc"]["primary"]
             cidr_secondaries = config["vpc"]["secondary"]
             subnets = config["subnets"]
@@ -521,9 +666,15 @@ module "planvpc-{region}" {{
             stdout=subprocess.PIPE,
             input="".join(layout).encode(),
         ).stdout
-        plan = cleanup.decode()
+        return cleanup.decode()
+
+    def generate_terraform_config(
+        self, profile="default", output="suggested.myregions.tf", include_unused=True
+    ):
+        """Generate a Terraform config for all regions and all subnets pre-planed by 'build_subnets'"""
+        tf = self.render_terraform(profile=profile, include_unused=include_unused)
 
-        pathlib.Path(output).write_text(plan)
+        pathlib.Path(output).write_text(tf)
         logger.info("[{}] Wrote terraform plan", output)
 
 